@@ -8,17 +8,22 @@ suitable for the ESP32-C6 PELLETINO project.
 Based on Galagino's ROM conversion scripts.
 
 Usage:
-    python3 convert_roms.py [rom_directory] [output_directory] [--game pacman|mspacman]
+    python3 convert_roms.py [rom_directory] [output_directory] [--game pacman|mspacman] [--force]
 
 If no arguments provided, uses:
     rom_directory: ../../../rom/
     output_directory: ../main/roms/
     game: pacman (auto-detects Ms. Pac-Man if boot1 present)
+
+Headers newer than all of their input ROMs (and this script) are left
+alone unless --force is given.
 """
 
 import sys
 import os
 import argparse
+from array import array
+from operator import itemgetter
 from pathlib import Path
 
 # ROM file definitions for Pac-Man
@@ -50,675 +55,682 @@ MSPACMAN_ALT_FILES = {
     'sprites': ['5f.cpu', 'pacman.5f'],
 }
 
-# Global to track which game we're converting
-ROM_FILES = PACMAN_ROM_FILES
-GAME_NAME = 'pacman'
+# ROM file definitions by game name
+GAME_ROM_FILES = {
+    'pacman': PACMAN_ROM_FILES,
+    'mspacman': MSPACMAN_ROM_FILES,
+}
+
+# Program ROM header (name, include guard, title) by game name
+PROGRAM_ROM_HEADERS = {
+    'pacman': ('pacman_rom', 'PACMAN_ROM_H', 'Pac-Man Program ROM'),
+    'mspacman': ('mspacman_rom', 'MSPACMAN_ROM_H', 'Ms. Pac-Man Program ROM'),
+}
+
+
+# Helper functions for MAME-style bitswap (Ms. Pac-Man patch ROM decryption)
+def bitswap8(val, b7, b6, b5, b4, b3, b2, b1, b0):
+    """Rearrange bits: new bit position <- old bit position"""
+    return (
+        (((val >> b7) & 1) << 7) |
+        (((val >> b6) & 1) << 6) |
+        (((val >> b5) & 1) << 5) |
+        (((val >> b4) & 1) << 4) |
+        (((val >> b3) & 1) << 3) |
+        (((val >> b2) & 1) << 2) |
+        (((val >> b1) & 1) << 1) |
+        (((val >> b0) & 1) << 0)
+    )
+
+
+def bitswap11(val, b10, b9, b8, b7, b6, b5, b4, b3, b2, b1, b0):
+    return (
+        (((val >> b10) & 1) << 10) |
+        (((val >> b9) & 1) << 9) |
+        (((val >> b8) & 1) << 8) |
+        (((val >> b7) & 1) << 7) |
+        (((val >> b6) & 1) << 6) |
+        (((val >> b5) & 1) << 5) |
+        (((val >> b4) & 1) << 4) |
+        (((val >> b3) & 1) << 3) |
+        (((val >> b2) & 1) << 2) |
+        (((val >> b1) & 1) << 1) |
+        (((val >> b0) & 1) << 0)
+    )
+
+
+def bitswap12(val, b11, b10, b9, b8, b7, b6, b5, b4, b3, b2, b1, b0):
+    return (
+        (((val >> b11) & 1) << 11) |
+        (((val >> b10) & 1) << 10) |
+        (((val >> b9) & 1) << 9) |
+        (((val >> b8) & 1) << 8) |
+        (((val >> b7) & 1) << 7) |
+        (((val >> b6) & 1) << 6) |
+        (((val >> b5) & 1) << 5) |
+        (((val >> b4) & 1) << 4) |
+        (((val >> b3) & 1) << 3) |
+        (((val >> b2) & 1) << 2) |
+        (((val >> b1) & 1) << 1) |
+        (((val >> b0) & 1) << 0)
+    )
+
+
+def bitswap_table(size, bitswap, *bits, base=0):
+    """Tabulate base + bitswap(i, *bits) for every address i in range(size).
+    
+    A bitswap is an OR of independent single-bit moves, so the low and
+    high address bytes are permuted separately and combined, calling
+    bitswap ~300 times instead of once per address.
+    """
+    low = [bitswap(i, *bits) for i in range(256)]
+    high = [base + bitswap(i << 8, *bits) for i in range(size >> 8)]
+    return array('H', [h | l for h in high for l in low])
+
+
+# The u5/u6/u7 data lines use one fixed bit permutation, so decrypt whole
+# blocks through a 256-entry table with bytes.translate()
+MSPACMAN_DATA_TABLE = bytes(bitswap8(v, 0, 4, 5, 7, 6, 3, 2, 1) for v in range(256))
+
+
+# 2bpp graphics: each ROM byte holds one pixel for each of 4 rows, with
+# the low nibble giving bit 0 and the high nibble bit 1 (masks 0x08 >> k
+# and 0x80 >> k, i.e. bits 3 - k and 7 - k, always 4 apart).
+# PIXEL_TABLES[y & 3][byte] is the pixel value (0-3) for row phase y & 3.
+PIXEL_TABLES = tuple(
+    bytes(((b >> (3 - k)) & 1) | (((b >> (7 - k)) & 1) << 1) for b in range(256))
+    for k in range(4)
+)
+
+
+# Sprite layout from Galagino's indexing formula: the right half
+# (x = 8-15) of sprite row y is the 8-byte run 2 * (y >> 3) + ((y >> 2) & 1)
+# of the sprite's 64 bytes, stored right to left, and the left half
+# (x = 0-7) is the run 4 further on. Pac-Man format: bottom 4 rows become
+# top 4 rows, so SPRITE_ROW_LAYOUT lists (row phase, right-half run) in
+# output row order.
+SPRITE_ROW_LAYOUT = tuple(
+    (y & 3, 2 * (y >> 3) + ((y >> 2) & 1)) for y in list(range(4, 16)) + list(range(4))
+)
+
+
+# MAME's mspacman_install_patches(): forty 8-byte (dest, src) copies into
+# the Pac-Man code. MAME's sources live in the high bank at 0x8xxx; our
+# decrypted ROM keeps that bank at 0x4000, so 0x8xxx -> 0x4xxx
+MSPACMAN_PATCHES = (
+    (0x0410, 0x4008),  # 0x8008 -> 0x4008
+    (0x08E0, 0x41D8),  # 0x81D8 -> 0x41D8
+    (0x0A30, 0x4118),  # 0x8118 -> 0x4118
+    (0x0BD0, 0x40D8),  # 0x80D8 -> 0x40D8
+    (0x0C20, 0x4120),  # 0x8120 -> 0x4120
+    (0x0E58, 0x4168),  # 0x8168 -> 0x4168
+    (0x0EA8, 0x4198),  # 0x8198 -> 0x4198
+
+    (0x1000, 0x4020),  # 0x8020 -> 0x4020
+    (0x1008, 0x4010),  # 0x8010 -> 0x4010
+    (0x1288, 0x4098),  # 0x8098 -> 0x4098
+    (0x1348, 0x4048),  # 0x8048 -> 0x4048
+    (0x1688, 0x4088),  # 0x8088 -> 0x4088
+    (0x16B0, 0x4188),  # 0x8188 -> 0x4188
+    (0x16D8, 0x40C8),  # 0x80C8 -> 0x40C8
+    (0x16F8, 0x41C8),  # 0x81C8 -> 0x41C8
+    (0x19A8, 0x40A8),  # 0x80A8 -> 0x40A8
+    (0x19B8, 0x41A8),  # 0x81A8 -> 0x41A8
+
+    (0x2060, 0x4148),  # 0x8148 -> 0x4148
+    (0x2108, 0x4018),  # 0x8018 -> 0x4018
+    (0x21A0, 0x41A0),  # 0x81A0 -> 0x41A0
+    (0x2298, 0x41E8),  # 0x81E8 -> 0x41E8
+    (0x23E0, 0x4038),  # 0x8038 -> 0x4038
+    (0x2418, 0x4000),  # 0x8000 -> 0x4000
+    (0x2448, 0x4058),  # 0x8058 -> 0x4058
+    (0x2470, 0x4140),  # 0x8140 -> 0x4140
+    (0x2488, 0x4080),  # 0x8080 -> 0x4080
+    (0x24B0, 0x4180),  # 0x8180 -> 0x4180
+    (0x24D8, 0x40C0),  # 0x80C0 -> 0x40C0
+    (0x24F8, 0x41C0),  # 0x81C0 -> 0x41C0
+    (0x2748, 0x4050),  # 0x8050 -> 0x4050
+    (0x2780, 0x4090),  # 0x8090 -> 0x4090
+    (0x27B8, 0x4190),  # 0x8190 -> 0x4190
+    (0x2800, 0x4028),  # 0x8028 -> 0x4028
+    (0x2B20, 0x4100),  # 0x8100 -> 0x4100
+    (0x2B30, 0x4110),  # 0x8110 -> 0x4110
+    (0x2BF0, 0x41D0),  # 0x81D0 -> 0x41D0
+    (0x2CC0, 0x40D0),  # 0x80D0 -> 0x40D0
+    (0x2CD8, 0x40E0),  # 0x80E0 -> 0x40E0
+    (0x2CF0, 0x41E0),  # 0x81E0 -> 0x41E0
+    (0x2D60, 0x4160),  # 0x8160 -> 0x4160
+)
+
+
+# Pac-Man color format: bits 0-2 red, 3-5 green, 6-7 blue, each bit
+# switching in a weighted resistor. Precompute the 8-bit level for every
+# possible 3-bit (red/green) and 2-bit (blue) field value.
+COLOR_RG_LEVELS = tuple(
+    (v & 1) * 0x21 + ((v >> 1) & 1) * 0x47 + ((v >> 2) & 1) * 0x97 for v in range(8)
+)
+COLOR_B_LEVELS = tuple((v & 1) * 0x51 + ((v >> 1) & 1) * 0xAE for v in range(4))
+
+
+# Sound PROM nibble -> signed sample byte. Galagino uses value - 7 (not value - 8)
+WAVE_SAMPLE_TABLE = bytes(((v & 0x0F) - 7) & 0xFF for v in range(256))
+
+
+def pack_pixels(runs):
+    """Pack 8-byte runs of one-byte pixels (0-3) into 16-bit words.
+    
+    Each run stores its pixels right to left: run[7 - x] lands at bit
+    2 * x of that run's word. All runs are read as one big integer and
+    every 8-bit lane is squeezed to a 2-bit lane SWAR style (pairs, then
+    quads, then whole words), so the loop over runs happens in C.
+    """
+    count = len(runs) // 8
+    val = int.from_bytes(runs, 'big')
+    val = (val | (val >> 6)) & int.from_bytes(b'\x00\x0f' * (4 * count), 'big')
+    val = (val | (val >> 12)) & int.from_bytes(b'\x00\x00\x00\xff' * (2 * count), 'big')
+    val = (val | (val >> 24)) & int.from_bytes(b'\x00\x00\x00\x00\x00\x00\xff\xff' * count, 'big')
+    
+    # Each 64-bit lane now holds its word in the low 16 bits
+    lanes = val.to_bytes(8 * count, 'big')
+    words = bytearray(2 * count)
+    words[0::2] = lanes[7::8]
+    words[1::2] = lanes[6::8]
+    words = array('H', words)
+    if sys.byteorder == 'big':
+        words.byteswap()
+    return words
+
+
+def reverse_pixels32(val):
+    """Reverse the order of the sixteen 2-bit pixels in a 32-bit row word.
+    
+    Swaps adjacent pixels, then pixel pairs, bytes and halves, which
+    mirrors a packed sprite row horizontally.
+    """
+    val = ((val & 0x33333333) << 2) | ((val >> 2) & 0x33333333)
+    val = ((val & 0x0F0F0F0F) << 4) | ((val >> 4) & 0x0F0F0F0F)
+    val = ((val & 0x00FF00FF) << 8) | ((val >> 8) & 0x00FF00FF)
+    return ((val & 0x0000FFFF) << 16) | (val >> 16)
 
 
 def read_rom_file(path):
     """Read a binary ROM file."""
-    with open(path, 'rb') as f:
-        return f.read()
+    return Path(path).read_bytes()
 
 
-def find_rom_file(rom_dir, candidates):
+def scan_rom_dir(rom_dir):
+    """Index the files in a ROM directory by case-folded name.
+    
+    One directory scan replaces a stat() per candidate name; converters
+    look names up in the returned {name: path} dict. Keys are case-folded
+    so dumps with upper-case names (PACMAN.6E) are found on any
+    filesystem; the ROM tables above already use lower-case names.
+    """
+    with os.scandir(rom_dir) as entries:
+        return {entry.name.casefold(): Path(entry.path) for entry in entries if entry.is_file()}
+
+
+def read_rom_files(paths):
+    """Read several ROM files back to back into one buffer.
+    
+    The buffer is allocated at its final size from the file sizes and
+    each file is read straight into its slice with readinto().
+    Returns the buffer and the list of file sizes.
+    """
+    sizes = [path.stat().st_size for path in paths]
+    data = bytearray(sum(sizes))
+    offset = 0
+    with memoryview(data) as view:
+        for path, size in zip(paths, sizes):
+            with open(path, 'rb') as f:
+                f.readinto(view[offset:offset + size])
+            offset += size
+    return data, sizes
+
+
+def find_rom_file(rom_index, candidates):
     """Find a ROM file from a list of possible names."""
     for name in candidates:
-        path = rom_dir / name
-        if path.exists():
+        path = rom_index.get(name.casefold())
+        if path:
             return path, name
     return None, None
 
 
+def is_up_to_date(out_path, inputs):
+    """Check whether out_path is newer than every input ROM file.
+    
+    An input counts as changed at the later of its mtime and ctime: ROMs
+    unpacked from archives (unzip, cp -p, rsync -a) keep old mtimes, but
+    replacing a file always bumps its ctime. This script is an input too,
+    so a converter change regenerates the headers. A missing input (None)
+    or output never counts as up to date, so the converter runs and
+    reports the problem as usual.
+    """
+    if None in inputs:
+        return False
+    try:
+        header_mtime = out_path.stat().st_mtime
+    except FileNotFoundError:
+        return False
+    stats = [path.stat() for path in (Path(__file__), *inputs)]
+    return max(max(st.st_mtime, st.st_ctime) for st in stats) < header_mtime
+
+
 def to_c_array(data, name, type_str='uint8_t', items_per_line=16):
-    """Convert binary data to a C array declaration."""
-    lines = [f'static const {type_str} {name}[] = {{']
+    """Convert binary data to a C array declaration, yielded line by line."""
+    yield f'static const {type_str} {name}[] = {{\n'
     
+    # bytes.hex() with a separator formats a whole line in C; the
+    # separators are then widened to the C ', 0x' form
     for i in range(0, len(data), items_per_line):
-        chunk = data[i:i+items_per_line]
-        hex_values = ', '.join(f'0x{b:02X}' for b in chunk)
-        lines.append(f'    {hex_values},')
+        hex_values = data[i:i+items_per_line].hex(' ').upper().replace(' ', ', 0x')
+        yield f'    0x{hex_values},\n'
     
-    lines.append('};')
-    lines.append(f'#define {name.upper()}_SIZE {len(data)}')
-    return '\n'.join(lines)
+    yield '};\n'
+    yield f'#define {name.upper()}_SIZE {len(data)}'
+
 
+def write_header(out_path, guard, title, chunks):
+    """Write an auto-generated C header file.
+    
+    Emits the shared comment/include-guard scaffold around the body,
+    streaming each text chunk from the iterable into one buffered file.
+    The header is written to a temporary file beside out_path and moved
+    into place only once complete, so an interrupted run never leaves a
+    truncated header behind.
+    """
+    tmp_path = out_path.with_suffix(out_path.suffix + '.tmp')
+    try:
+        with open(tmp_path, 'w', buffering=1 << 20) as f:
+            f.write(f'/* {out_path.name} - {title} */\n'
+                    '/* AUTO-GENERATED - DO NOT EDIT */\n'
+                    '\n'
+                    f'#ifndef {guard}\n'
+                    f'#define {guard}\n'
+                    '\n'
+                    '#include <stdint.h>\n'
+                    '\n')
+            for chunk in chunks:
+                f.write(chunk)
+            f.write(f'\n\n#endif // {guard}')
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
 
-def convert_program_rom(rom_dir, out_dir):
+
+def convert_program_rom(rom_index, out_dir, game_name, rom_files, force=False):
     """Convert program ROMs to a single header file."""
-    global GAME_NAME
     print("Converting program ROMs...")
     
-    rom_data = bytearray()
+    header_name, guard_name, comment = PROGRAM_ROM_HEADERS[game_name]
+    out_path = out_dir / f'{header_name}.h'
     
-    if GAME_NAME == 'mspacman':
-        # Check which Ms. Pac-Man variant we have
-        if (rom_dir / 'boot1').exists():
-            # Boot ROM variant (standalone Ms. Pac-Man ROMs)
-            print("  Using boot ROM variant...")
-            for rom_file in ['boot1', 'boot2', 'boot3', 'boot4', 'boot5', 'boot6']:
-                path = rom_dir / rom_file
-                if not path.exists():
-                    print(f"  ERROR: Missing {rom_file}")
-                    return False
-                data = read_rom_file(path)
-                rom_data.extend(data)
-                print(f"  {rom_file}: {len(data)} bytes")
-        elif (rom_dir / 'u5').exists():
-            # Patch ROM variant (Pac-Man base + u5/u6/u7 patches)
-            # Based on MAME's mspacman driver decryption (init_mspacman)
-            print("  Using patch ROM variant (pacman.6* + u5/u6/u7)...")
-            print("  Applying MAME-style decryption...")
-            
-            # Helper functions for MAME-style bitswap
-            def bitswap8(val, b7, b6, b5, b4, b3, b2, b1, b0):
-                """Rearrange bits: new bit position <- old bit position"""
-                return (
-                    (((val >> b7) & 1) << 7) |
-                    (((val >> b6) & 1) << 6) |
-                    (((val >> b5) & 1) << 5) |
-                    (((val >> b4) & 1) << 4) |
-                    (((val >> b3) & 1) << 3) |
-                    (((val >> b2) & 1) << 2) |
-                    (((val >> b1) & 1) << 1) |
-                    (((val >> b0) & 1) << 0)
-                )
-            
-            def bitswap11(val, b10, b9, b8, b7, b6, b5, b4, b3, b2, b1, b0):
-                return (
-                    (((val >> b10) & 1) << 10) |
-                    (((val >> b9) & 1) << 9) |
-                    (((val >> b8) & 1) << 8) |
-                    (((val >> b7) & 1) << 7) |
-                    (((val >> b6) & 1) << 6) |
-                    (((val >> b5) & 1) << 5) |
-                    (((val >> b4) & 1) << 4) |
-                    (((val >> b3) & 1) << 3) |
-                    (((val >> b2) & 1) << 2) |
-                    (((val >> b1) & 1) << 1) |
-                    (((val >> b0) & 1) << 0)
-                )
-            
-            def bitswap12(val, b11, b10, b9, b8, b7, b6, b5, b4, b3, b2, b1, b0):
-                return (
-                    (((val >> b11) & 1) << 11) |
-                    (((val >> b10) & 1) << 10) |
-                    (((val >> b9) & 1) << 9) |
-                    (((val >> b8) & 1) << 8) |
-                    (((val >> b7) & 1) << 7) |
-                    (((val >> b6) & 1) << 6) |
-                    (((val >> b5) & 1) << 5) |
-                    (((val >> b4) & 1) << 4) |
-                    (((val >> b3) & 1) << 3) |
-                    (((val >> b2) & 1) << 2) |
-                    (((val >> b1) & 1) << 1) |
-                    (((val >> b0) & 1) << 0)
-                )
-            
-            # Load all source ROMs into a flat buffer at MAME addresses
-            # MAME loads: pacman.6e@0x0000, pacman.6f@0x1000, pacman.6h@0x2000, pacman.6j@0x3000
-            #             u5@0x8000, u6@0x9000, u7@0xb000
-            src_rom = bytearray(0x10000)  # 64KB source space
-            
-            base_roms = [('pacman.6e', 0x0000), ('pacman.6f', 0x1000), 
-                         ('pacman.6h', 0x2000), ('pacman.6j', 0x3000)]
-            for rom_file, addr in base_roms:
-                path = rom_dir / rom_file
-                if not path.exists():
-                    print(f"  ERROR: Missing base ROM {rom_file}")
-                    return False
-                data = read_rom_file(path)
-                for i, b in enumerate(data):
-                    src_rom[addr + i] = b
-                print(f"  {rom_file}: {len(data)} bytes @ 0x{addr:04X}")
-            
-            # Load patch ROMs
-            u5_path, u6_path, u7_path = rom_dir / 'u5', rom_dir / 'u6', rom_dir / 'u7'
-            if not all(p.exists() for p in [u5_path, u6_path, u7_path]):
-                print("  ERROR: Missing patch ROMs (u5, u6, u7)")
+    # Ms. Pac-Man sets without boot ROMs are built from the patch ROMs
+    patch_variant = game_name == 'mspacman' and 'boot1' not in rom_index
+    program_files = MSPACMAN_ALT_FILES['program'] if patch_variant else rom_files['program']
+    if not force and is_up_to_date(out_path, [rom_index.get(name) for name in program_files]):
+        print(f"  {out_path} up-to-date, skipping")
+        return True
+    
+    if patch_variant:
+        if 'u5' not in rom_index:
+            print("  ERROR: No Ms. Pac-Man ROMs found (need boot1-6 or pacman.6* + u5/u6/u7)")
+            return False
+        
+        # Patch ROM variant (Pac-Man base + u5/u6/u7 patches)
+        # Based on MAME's mspacman driver decryption (init_mspacman)
+        print("  Using patch ROM variant (pacman.6* + u5/u6/u7)...")
+        print("  Applying MAME-style decryption...")
+        
+        # Load all source ROMs into a flat buffer at MAME addresses
+        # MAME loads: pacman.6e@0x0000, pacman.6f@0x1000, pacman.6h@0x2000, pacman.6j@0x3000
+        #             u5@0x8000, u6@0x9000, u7@0xb000
+        src_rom = bytearray(0x10000)  # 64KB source space
+        
+        base_roms = [('pacman.6e', 0x0000), ('pacman.6f', 0x1000), 
+                     ('pacman.6h', 0x2000), ('pacman.6j', 0x3000)]
+        for rom_file, addr in base_roms:
+            if rom_file not in rom_index:
+                print(f"  ERROR: Missing base ROM {rom_file}")
                 return False
-            
-            u5_data = read_rom_file(u5_path)
-            u6_data = read_rom_file(u6_path)
-            u7_data = read_rom_file(u7_path)
-            
-            # Place at MAME addresses
-            for i, b in enumerate(u5_data):
-                src_rom[0x8000 + i] = b
-            for i, b in enumerate(u6_data):
-                src_rom[0x9000 + i] = b
-            for i, b in enumerate(u7_data):
-                src_rom[0xb000 + i] = b
-            
-            print(f"  u5: {len(u5_data)} bytes @ 0x8000")
-            print(f"  u6: {len(u6_data)} bytes @ 0x9000")
-            print(f"  u7: {len(u7_data)} bytes @ 0xB000")
-            
-            # Create decrypted ROM (DROM in MAME terminology)
-            # This is the final 24KB output that the emulator will use
-            drom = bytearray(0x6000)
-            
-            # Copy base Pac-Man ROMs unmodified (0x0000-0x3FFF)
-            for i in range(0x1000):
-                drom[0x0000 + i] = src_rom[0x0000 + i]  # pacman.6e
-                drom[0x1000 + i] = src_rom[0x1000 + i]  # pacman.6f
-                drom[0x2000 + i] = src_rom[0x2000 + i]  # pacman.6h
-                # pacman.6j -> decrypt u7 for 0x3000-0x3FFF
-                addr = bitswap12(i, 11, 3, 7, 9, 10, 8, 6, 5, 4, 2, 1, 0)
-                drom[0x3000 + i] = bitswap8(src_rom[0xb000 + addr], 0, 4, 5, 7, 6, 3, 2, 1)
-            
+            data = read_rom_file(rom_index[rom_file])
+            src_rom[addr:addr + len(data)] = data
+            print(f"  {rom_file}: {len(data)} bytes @ 0x{addr:04X}")
+        
+        # Load patch ROMs
+        if not all(name in rom_index for name in ['u5', 'u6', 'u7']):
+            print("  ERROR: Missing patch ROMs (u5, u6, u7)")
+            return False
+        
+        u5_data = read_rom_file(rom_index['u5'])
+        u6_data = read_rom_file(rom_index['u6'])
+        u7_data = read_rom_file(rom_index['u7'])
+        
+        # Place at MAME addresses
+        src_rom[0x8000:0x8000 + len(u5_data)] = u5_data
+        src_rom[0x9000:0x9000 + len(u6_data)] = u6_data
+        src_rom[0xb000:0xb000 + len(u7_data)] = u7_data
+        
+        print(f"  u5: {len(u5_data)} bytes @ 0x8000")
+        print(f"  u6: {len(u6_data)} bytes @ 0x9000")
+        print(f"  u7: {len(u7_data)} bytes @ 0xB000")
+        
+        # Create decrypted ROM (DROM in MAME terminology)
+        # This is the final 24KB output that the emulator will use
+        drom = bytearray(0x6000)
+        
+        # Copy base Pac-Man ROMs unmodified (pacman.6e/6f/6h -> 0x0000-0x2FFF)
+        drom[0x0000:0x3000] = src_rom[0x0000:0x3000]
+        
+        # Decrypt the contiguous 0x3000-0x57FF range in one pass: a single
+        # address table into src_rom, gathered by itemgetter in C, then
+        # the data-table translate
+        decrypt_addr = (
+            # pacman.6j -> decrypt u7 for 0x3000-0x3FFF
+            bitswap_table(0x1000, bitswap12, 11, 3, 7, 9, 10, 8, 6, 5, 4, 2, 1, 0, base=0xb000) +
             # Decrypt u5 -> 0x4000-0x47FF (2KB)
-            for i in range(0x800):
-                addr = bitswap11(i, 8, 7, 5, 9, 10, 6, 3, 4, 2, 1, 0)
-                drom[0x4000 + i] = bitswap8(src_rom[0x8000 + addr], 0, 4, 5, 7, 6, 3, 2, 1)
-            
+            bitswap_table(0x800, bitswap11, 8, 7, 5, 9, 10, 6, 3, 4, 2, 1, 0, base=0x8000) +
             # Decrypt u6 -> 0x4800-0x4FFF and 0x5000-0x57FF (two 2KB halves)
-            for i in range(0x800):
-                addr = bitswap11(i, 3, 7, 9, 10, 8, 6, 5, 4, 2, 1, 0)
-                drom[0x4800 + i] = bitswap8(src_rom[0x9800 + addr], 0, 4, 5, 7, 6, 3, 2, 1)
-                drom[0x5000 + i] = bitswap8(src_rom[0x9000 + addr], 0, 4, 5, 7, 6, 3, 2, 1)
-            
-            # Fill rest with mirrors as MAME does
-            for i in range(0x800):
-                drom[0x5800 + i] = src_rom[0x1800 + i]  # mirror of pacman.6f high
-            
-            print("  Decrypted u5/u6/u7")
-            
-            # Now apply the 8-byte patches from the decrypted area
-            # MAME's mspacman_install_patches - exact addresses from MAME source
-            # Our drom layout: 0x0000-0x3FFF = base code, 0x4000-0x47FF = u5 decrypted,
-            #                  0x4800-0x4FFF = u6 high decrypted, 0x5000-0x57FF = u6 low decrypted
-            # MAME's high bank is at 0x8000, our equivalent is at 0x4000
-            # So 0x8xxx -> 0x4xxx (subtract 0x4000)
-            def install_patches(rom):
-                """Copy forty 8-byte patches into Pac-Man code
-                   Exact port of MAME's mspacman_install_patches()
-                """
-                for i in range(8):
-                    # From MAME: ROM[dest] = ROM[src] where src is in high bank (0x8xxx)
-                    # Our drom maps 0x8xxx -> 0x4xxx
-                    rom[0x0410+i] = rom[0x4008+i]   # 0x8008 -> 0x4008
-                    rom[0x08E0+i] = rom[0x41D8+i]   # 0x81D8 -> 0x41D8
-                    rom[0x0A30+i] = rom[0x4118+i]   # 0x8118 -> 0x4118
-                    rom[0x0BD0+i] = rom[0x40D8+i]   # 0x80D8 -> 0x40D8
-                    rom[0x0C20+i] = rom[0x4120+i]   # 0x8120 -> 0x4120
-                    rom[0x0E58+i] = rom[0x4168+i]   # 0x8168 -> 0x4168
-                    rom[0x0EA8+i] = rom[0x4198+i]   # 0x8198 -> 0x4198
-                    
-                    rom[0x1000+i] = rom[0x4020+i]   # 0x8020 -> 0x4020
-                    rom[0x1008+i] = rom[0x4010+i]   # 0x8010 -> 0x4010
-                    rom[0x1288+i] = rom[0x4098+i]   # 0x8098 -> 0x4098
-                    rom[0x1348+i] = rom[0x4048+i]   # 0x8048 -> 0x4048
-                    rom[0x1688+i] = rom[0x4088+i]   # 0x8088 -> 0x4088
-                    rom[0x16B0+i] = rom[0x4188+i]   # 0x8188 -> 0x4188
-                    rom[0x16D8+i] = rom[0x40C8+i]   # 0x80C8 -> 0x40C8
-                    rom[0x16F8+i] = rom[0x41C8+i]   # 0x81C8 -> 0x41C8
-                    rom[0x19A8+i] = rom[0x40A8+i]   # 0x80A8 -> 0x40A8
-                    rom[0x19B8+i] = rom[0x41A8+i]   # 0x81A8 -> 0x41A8
-                    
-                    rom[0x2060+i] = rom[0x4148+i]   # 0x8148 -> 0x4148
-                    rom[0x2108+i] = rom[0x4018+i]   # 0x8018 -> 0x4018
-                    rom[0x21A0+i] = rom[0x41A0+i]   # 0x81A0 -> 0x41A0
-                    rom[0x2298+i] = rom[0x41E8+i]   # 0x81E8 -> 0x41E8
-                    rom[0x23E0+i] = rom[0x4038+i]   # 0x8038 -> 0x4038
-                    rom[0x2418+i] = rom[0x4000+i]   # 0x8000 -> 0x4000
-                    rom[0x2448+i] = rom[0x4058+i]   # 0x8058 -> 0x4058
-                    rom[0x2470+i] = rom[0x4140+i]   # 0x8140 -> 0x4140
-                    rom[0x2488+i] = rom[0x4080+i]   # 0x8080 -> 0x4080
-                    rom[0x24B0+i] = rom[0x4180+i]   # 0x8180 -> 0x4180
-                    rom[0x24D8+i] = rom[0x40C0+i]   # 0x80C0 -> 0x40C0
-                    rom[0x24F8+i] = rom[0x41C0+i]   # 0x81C0 -> 0x41C0
-                    rom[0x2748+i] = rom[0x4050+i]   # 0x8050 -> 0x4050
-                    rom[0x2780+i] = rom[0x4090+i]   # 0x8090 -> 0x4090
-                    rom[0x27B8+i] = rom[0x4190+i]   # 0x8190 -> 0x4190
-                    rom[0x2800+i] = rom[0x4028+i]   # 0x8028 -> 0x4028
-                    rom[0x2B20+i] = rom[0x4100+i]   # 0x8100 -> 0x4100
-                    rom[0x2B30+i] = rom[0x4110+i]   # 0x8110 -> 0x4110
-                    rom[0x2BF0+i] = rom[0x41D0+i]   # 0x81D0 -> 0x41D0
-                    rom[0x2CC0+i] = rom[0x40D0+i]   # 0x80D0 -> 0x40D0
-                    rom[0x2CD8+i] = rom[0x40E0+i]   # 0x80E0 -> 0x40E0
-                    rom[0x2CF0+i] = rom[0x41E0+i]   # 0x81E0 -> 0x41E0
-                    rom[0x2D60+i] = rom[0x4160+i]   # 0x8160 -> 0x4160
-            
-            install_patches(drom)
-            print("  Applied 40 8-byte patches")
-            
-            rom_data = drom
-            print(f"  Total ROM size: {len(rom_data)} bytes")
-        else:
-            print("  ERROR: No Ms. Pac-Man ROMs found (need boot1-6 or pacman.6* + u5/u6/u7)")
-            return False
+            bitswap_table(0x800, bitswap11, 3, 7, 9, 10, 8, 6, 5, 4, 2, 1, 0, base=0x9800) +
+            bitswap_table(0x800, bitswap11, 3, 7, 9, 10, 8, 6, 5, 4, 2, 1, 0, base=0x9000)
+        )
+        drom[0x3000:0x5800] = bytes(itemgetter(*decrypt_addr)(src_rom)).translate(MSPACMAN_DATA_TABLE)
+        
+        # Fill rest with mirrors as MAME does
+        drom[0x5800:0x6000] = src_rom[0x1800:0x2000]  # mirror of pacman.6f high
+        
+        print("  Decrypted u5/u6/u7")
+        
+        # Now apply the 8-byte patches from the decrypted area
+        # MAME's mspacman_install_patches - exact addresses from MAME source
+        # Our drom layout: 0x0000-0x3FFF = base code, 0x4000-0x47FF = u5 decrypted,
+        #                  0x4800-0x4FFF = u6 high decrypted, 0x5000-0x57FF = u6 low decrypted
+        # MAME's high bank is at 0x8000, our equivalent is at 0x4000
+        # So 0x8xxx -> 0x4xxx (subtract 0x4000)
+        def install_patches(rom):
+            """Copy forty 8-byte patches into Pac-Man code
+               Exact port of MAME's mspacman_install_patches()
+            """
+            for dest, src in MSPACMAN_PATCHES:
+                rom[dest:dest + 8] = rom[src:src + 8]
         
-        header_name = 'mspacman_rom'
-        guard_name = 'MSPACMAN_ROM_H'
-        comment = 'Ms. Pac-Man Program ROM'
+        install_patches(drom)
+        print("  Applied 40 8-byte patches")
+        
+        rom_data = drom
+        print(f"  Total ROM size: {len(rom_data)} bytes")
     else:
-        # Regular Pac-Man
-        for rom_file in ROM_FILES['program']:
-            path = rom_dir / rom_file
-            if not path.exists():
+        # Regular Pac-Man, or the Ms. Pac-Man boot ROM variant (standalone
+        # boot1-6 ROMs) - both are a straight concatenation of the program ROMs
+        if game_name == 'mspacman':
+            print("  Using boot ROM variant...")
+        for rom_file in rom_files['program']:
+            if rom_file not in rom_index:
                 print(f"  ERROR: Missing {rom_file}")
                 return False
-            data = read_rom_file(path)
-            rom_data.extend(data)
-            print(f"  {rom_file}: {len(data)} bytes")
-        
-        header_name = 'pacman_rom'
-        guard_name = 'PACMAN_ROM_H'
-        comment = 'Pac-Man Program ROM'
-    
-    output = [
-        f'/* {header_name}.h - {comment} */',
-        '/* AUTO-GENERATED - DO NOT EDIT */',
-        '',
-        f'#ifndef {guard_name}',
-        f'#define {guard_name}',
-        '',
-        '#include <stdint.h>',
-        '',
-        to_c_array(rom_data, header_name),
-        '',
-        f'#endif // {guard_name}',
-    ]
+        rom_data, sizes = read_rom_files([rom_index[rom_file] for rom_file in rom_files['program']])
+        for rom_file, size in zip(rom_files['program'], sizes):
+            print(f"  {rom_file}: {size} bytes")
     
-    out_path = out_dir / f'{header_name}.h'
-    with open(out_path, 'w') as f:
-        f.write('\n'.join(output))
+    write_header(out_path, guard_name, comment, to_c_array(rom_data, header_name))
     
     print(f"  Wrote {out_path} ({len(rom_data)} bytes)")
     return True
 
 
-def convert_tiles(rom_dir, out_dir):
+def convert_tiles(rom_index, out_dir, game_name, rom_files, force=False):
     """Convert tile graphics ROM."""
-    global GAME_NAME
     print("Converting tile graphics...")
     
     # Try to find the tile ROM
-    tile_names = ROM_FILES['tiles']
-    if GAME_NAME == 'mspacman':
+    tile_names = rom_files['tiles']
+    if game_name == 'mspacman':
         tile_names = MSPACMAN_ROM_FILES['tiles'] + MSPACMAN_ALT_FILES.get('tiles', [])
     
-    path, found_name = find_rom_file(rom_dir, tile_names)
+    path, found_name = find_rom_file(rom_index, tile_names)
     if not path:
         # Fall back to Pac-Man tile ROM if Ms. Pac-Man one not found
-        path = rom_dir / 'pacman.5e'
-        if not path.exists():
+        path = rom_index.get('pacman.5e')
+        if not path:
             print(f"  ERROR: Missing tile ROM (tried: {', '.join(tile_names)})")
             return False
         found_name = 'pacman.5e'
     
+    prefix = game_name
+    out_path = out_dir / f'{prefix}_tilemap.h'
+    if not force and is_up_to_date(out_path, [path]):
+        print(f"  {out_path} up-to-date, skipping")
+        return True
+    
     raw_data = read_rom_file(path)
     print(f"  {found_name}: {len(raw_data)} bytes")
     
-    def parse_chr(data):
-        """Parse a single 8x8 tile from 16 bytes of ROM data.
-        
-        Based on Galagino's tile parsing algorithm.
-        """
-        char = []
-        for y in range(8):
-            row = []
-            for x in range(8):
-                # Galagino's proven indexing formula for tiles
-                byte = data[15 - x - 2 * (y & 4)]
-                c0 = 1 if byte & (0x08 >> (y & 3)) else 0
-                c1 = 2 if byte & (0x80 >> (y & 3)) else 0
-                row.append(c0 + c1)
-            char.append(row)
-        return char
-    
-    def dump_chr(char_data):
-        """Convert tile to packed 16-bit words for each row."""
-        words = []
-        for y in range(8):
-            val = 0
-            for x in range(8):
-                val = (val >> 2) + (char_data[y][x] << 14)
-            words.append(val & 0xFFFF)
-        return words
-    
-    # Parse and convert all 256 tiles
-    tile_words = []
-    for tile_idx in range(256):
-        tile_data = raw_data[16 * tile_idx : 16 * (tile_idx + 1)]
-        char = parse_chr(tile_data)
-        words = dump_chr(char)
-        tile_words.extend(words)
-    
-    prefix = 'mspacman' if GAME_NAME == 'mspacman' else 'pacman'
-    
-    output = [
-        f'/* {prefix}_tilemap.h - {GAME_NAME.title()} Tile Graphics */',
-        '/* AUTO-GENERATED - DO NOT EDIT */',
-        '',
-        f'#ifndef {prefix.upper()}_TILEMAP_H',
-        f'#define {prefix.upper()}_TILEMAP_H',
-        '',
-        '#include <stdint.h>',
-        '',
-        f'// {len(tile_words)} 16-bit words = 256 tiles × 8 rows',
-        f'static const uint16_t {prefix}_5e[] = {{',
-    ]
-    
-    for i in range(0, len(tile_words), 8):
-        chunk = tile_words[i:i+8]
-        hex_values = ', '.join(f'0x{w:04X}' for w in chunk)
-        output.append(f'    {hex_values},')
-    
-    output.extend([
-        '};',
-        '',
-        f'#endif // {prefix.upper()}_TILEMAP_H',
-    ])
-    
-    out_path = out_dir / f'{prefix}_tilemap.h'
-    with open(out_path, 'w') as f:
-        f.write('\n'.join(output))
+    # Decode every ROM byte once per row phase (y & 3) with a C-level
+    # translate. Galagino's indexing formula reads byte 15 - x - 2 * (y & 4)
+    # for pixel (x, y), so every tile row is an 8-byte run stored right to
+    # left: rows 0-3 use the tile's second run, rows 4-7 its first.
+    raw_data = raw_data[:256 * 16].ljust(256 * 16, b'\x00')
+    tile_words = array('H', [0]) * (256 * 8)
+    for phase, table in enumerate(PIXEL_TABLES):
+        run_words = pack_pixels(raw_data.translate(table))
+        tile_words[phase::8] = run_words[1::2]
+        tile_words[4 + phase::8] = run_words[0::2]
+    
+    def tile_lines():
+        yield f'// {len(tile_words)} 16-bit words = 256 tiles × 8 rows\n'
+        yield f'static const uint16_t {prefix}_5e[] = {{\n'
+        line_fmt = '    ' + ', '.join(['0x%04X'] * 8) + ',\n'
+        for i in range(0, len(tile_words), 8):
+            yield line_fmt % tuple(tile_words[i:i+8])
+        yield '};'
+    
+    write_header(out_path, f'{prefix.upper()}_TILEMAP_H', f'{game_name.title()} Tile Graphics',
+                 tile_lines())
     
     print(f"  Wrote {out_path}")
     return True
 
 
-def convert_sprites(rom_dir, out_dir):
+def convert_sprites(rom_index, out_dir, game_name, rom_files, force=False):
     """Convert sprite graphics ROM."""
-    global GAME_NAME
     print("Converting sprite graphics...")
     
     # Try to find the sprite ROM
-    sprite_names = ROM_FILES['sprites']
-    if GAME_NAME == 'mspacman':
+    sprite_names = rom_files['sprites']
+    if game_name == 'mspacman':
         sprite_names = MSPACMAN_ROM_FILES['sprites'] + MSPACMAN_ALT_FILES.get('sprites', [])
     
-    path, found_name = find_rom_file(rom_dir, sprite_names)
+    path, found_name = find_rom_file(rom_index, sprite_names)
     if not path:
         # Fall back to Pac-Man sprite ROM if Ms. Pac-Man one not found
-        path = rom_dir / 'pacman.5f'
-        if not path.exists():
+        path = rom_index.get('pacman.5f')
+        if not path:
             print(f"  ERROR: Missing sprite ROM (tried: {', '.join(sprite_names)})")
             return False
         found_name = 'pacman.5f'
     
+    prefix = game_name
+    out_path = out_dir / f'{prefix}_spritemap.h'
+    if not force and is_up_to_date(out_path, [path]):
+        print(f"  {out_path} up-to-date, skipping")
+        return True
+    
     raw_data = read_rom_file(path)
     print(f"  {found_name}: {len(raw_data)} bytes")
     
-    def parse_sprite(data):
-        """Parse a single 16x16 sprite from 64 bytes of ROM data.
-        
-        Based on Galagino's sprite parsing - Pac-Man format has a specific
-        layout where the top 4 rows are actually the bottom 4.
-        """
-        sprite = []
-        for y in range(16):
-            row = []
-            for x in range(16):
-                # Galagino's proven indexing formula
-                idx = ((y & 8) << 1) + (((x & 8) ^ 8) << 2) + (7 - (x & 7)) + 2 * (y & 4)
-                if idx < len(data):
-                    # Extract 2-bit pixel from planar data
-                    c0 = 1 if data[idx] & (0x08 >> (y & 3)) else 0
-                    c1 = 2 if data[idx] & (0x80 >> (y & 3)) else 0
-                    row.append(c0 + c1)
-                else:
-                    row.append(0)
-            sprite.append(row)
-        
-        # Pac-Man format: bottom 4 rows become top 4 rows
-        sprite = sprite[4:] + sprite[:4]
-        return sprite
-    
-    def dump_sprite(sprite_data, flip_x, flip_y):
-        """Convert sprite to packed 32-bit words for each row."""
-        rows = []
-        y_range = reversed(range(16)) if flip_y else range(16)
-        
-        for y in y_range:
-            val = 0
-            for x in range(16):
-                if not flip_x:
-                    val = (val >> 2) + (sprite_data[y][x] << 30)
-                else:
-                    val = (val << 2) + sprite_data[y][x]
-            rows.append(val & 0xFFFFFFFF)
-        return rows
-    
-    # Parse all 64 sprites
-    parsed_sprites = []
-    for sprite_idx in range(64):
-        sprite_data = raw_data[64 * sprite_idx : 64 * (sprite_idx + 1)]
-        parsed_sprites.append(parse_sprite(sprite_data))
+    # Pad a short ROM so missing pixels decode as 0, then decode and pack
+    # every ROM byte once per row phase (y & 3) as for tiles
+    raw_data = raw_data[:64 * 64].ljust(64 * 64, b'\x00')
+    run_words = [pack_pixels(raw_data.translate(table)) for table in PIXEL_TABLES]
+    
+    # Pack row words for all 64 sprites at once, one strided slice per row
+    sprite_rows = array('I', [0]) * (64 * 16)
+    for row, (phase, run) in enumerate(SPRITE_ROW_LAYOUT):
+        words = run_words[phase]
+        sprite_rows[row::16] = array('I', [(right << 16) | left for right, left
+                                           in zip(words[run::8], words[run + 4::8])])
+    
+    # flip_x reverses the pixels within each row word, flip_y the row order
+    flipped_rows = array('I', map(reverse_pixels32, sprite_rows))
     
     # Convert sprites for 4 flip variants
     # Galagino order: mode 0=none, mode 1=flip_y, mode 2=flip_x, mode 3=both
-    all_sprites = []
+    all_sprites = array('I', [0]) * (4 * 64 * 16)
     for flip_mode in range(4):
         flip_y = (flip_mode & 1) != 0  # bit 0 = flip_y
         flip_x = (flip_mode & 2) != 0  # bit 1 = flip_x
         
-        for sprite in parsed_sprites:
-            rows = dump_sprite(sprite, flip_x, flip_y)
-            all_sprites.extend(rows)
-    
-    prefix = 'mspacman' if GAME_NAME == 'mspacman' else 'pacman'
-    
-    output = [
-        f'/* {prefix}_spritemap.h - {GAME_NAME.title()} Sprite Graphics */',
-        '/* AUTO-GENERATED - DO NOT EDIT */',
-        '',
-        f'#ifndef {prefix.upper()}_SPRITEMAP_H',
-        f'#define {prefix.upper()}_SPRITEMAP_H',
-        '',
-        '#include <stdint.h>',
-        '',
-        '// 4 flip modes × 64 sprites × 16 rows = 4096 32-bit words',
-        f'static const uint32_t {prefix}_sprites[4][64][16] = {{',
-    ]
-    
-    idx = 0
-    for flip in range(4):
-        output.append(f'  {{ // Flip mode {flip}')
-        for sprite in range(64):
-            row_data = all_sprites[idx:idx+16]
-            hex_values = ', '.join(f'0x{w:08X}' for w in row_data)
-            output.append(f'    {{ {hex_values} }},')
-            idx += 16
-        output.append('  },')
-    
-    output.extend([
-        '};',
-        '',
-        f'#endif // {prefix.upper()}_SPRITEMAP_H',
-    ])
-    
-    out_path = out_dir / f'{prefix}_spritemap.h'
-    with open(out_path, 'w') as f:
-        f.write('\n'.join(output))
+        rows = flipped_rows if flip_x else sprite_rows
+        block = flip_mode * 64 * 16
+        for row in range(16):
+            all_sprites[block + row:block + 64 * 16:16] = rows[(15 - row if flip_y else row)::16]
+    
+    def sprite_lines():
+        yield '// 4 flip modes × 64 sprites × 16 rows = 4096 32-bit words\n'
+        yield f'static const uint32_t {prefix}_sprites[4][64][16] = {{\n'
+        # One format operation per flip mode covers all 64 sprites
+        row_fmt = '    { ' + ', '.join(['0x%08X'] * 16) + ' },\n'
+        block_fmt = '  { // Flip mode %d\n' + row_fmt * 64 + '  },\n'
+        for flip in range(4):
+            yield block_fmt % (flip, *all_sprites[flip * 64 * 16:(flip + 1) * 64 * 16])
+        yield '};'
+    
+    write_header(out_path, f'{prefix.upper()}_SPRITEMAP_H', f'{game_name.title()} Sprite Graphics',
+                 sprite_lines())
     
     print(f"  Wrote {out_path}")
     return True
 
 
-def convert_colormap(rom_dir, out_dir):
+def convert_colormap(rom_index, out_dir, game_name, rom_files, force=False):
     """Convert color PROMs to RGB565 palette."""
-    global GAME_NAME
     print("Converting color palette...")
     
-    color_path = rom_dir / ROM_FILES['color_prom'][0]
-    palette_path = rom_dir / ROM_FILES['palette_prom'][0]
+    color_path = rom_index.get(rom_files['color_prom'][0])
+    palette_path = rom_index.get(rom_files['palette_prom'][0])
     
-    if not color_path.exists():
-        print(f"  ERROR: Missing {ROM_FILES['color_prom'][0]}")
+    if not color_path:
+        print(f"  ERROR: Missing {rom_files['color_prom'][0]}")
         return False
-    if not palette_path.exists():
-        print(f"  ERROR: Missing {ROM_FILES['palette_prom'][0]}")
+    if not palette_path:
+        print(f"  ERROR: Missing {rom_files['palette_prom'][0]}")
         return False
     
+    prefix = game_name
+    out_path = out_dir / f'{prefix}_cmap.h'
+    if not force and is_up_to_date(out_path, [color_path, palette_path]):
+        print(f"  {out_path} up-to-date, skipping")
+        return True
+    
     color_prom = read_rom_file(color_path)
     palette_prom = read_rom_file(palette_path)
     
-    print(f"  {ROM_FILES['color_prom'][0]}: {len(color_prom)} bytes")
-    print(f"  {ROM_FILES['palette_prom'][0]}: {len(palette_prom)} bytes")
+    print(f"  {rom_files['color_prom'][0]}: {len(color_prom)} bytes")
+    print(f"  {rom_files['palette_prom'][0]}: {len(palette_prom)} bytes")
     
     # Color PROM maps 3-bit values to RGB
     # Palette PROM maps attribute to 4 colors
     
     # First, decode the 32 base colors from color PROM
-    base_colors = []
-    for i in range(32):
-        if i < len(color_prom):
-            val = color_prom[i]
-            # Pac-Man color format: xxRRRGGGBBB (resistor weighted)
-            r = ((val >> 0) & 1) * 0x21 + ((val >> 1) & 1) * 0x47 + ((val >> 2) & 1) * 0x97
-            g = ((val >> 3) & 1) * 0x21 + ((val >> 4) & 1) * 0x47 + ((val >> 5) & 1) * 0x97
-            b = ((val >> 6) & 1) * 0x51 + ((val >> 7) & 1) * 0xAE
-        else:
-            r, g, b = 0, 0, 0
-        
-        # Convert to RGB565
-        rgb565 = ((r >> 3) << 11) | ((g >> 2) << 5) | (b >> 3)
-        base_colors.append(rgb565)
+    # (missing entries read as 0, i.e. black)
+    base_colors = [
+        ((COLOR_RG_LEVELS[val & 7] >> 3) << 11) |
+        ((COLOR_RG_LEVELS[(val >> 3) & 7] >> 2) << 5) |
+        (COLOR_B_LEVELS[val >> 6] >> 3)
+        for val in color_prom[:32].ljust(32, b'\x00')
+    ]
     
     # Now build the 64 palettes (4 colors each) from palette PROM
-    colormap = []
-    for pal_idx in range(64):
-        for color_idx in range(4):
-            prom_addr = pal_idx * 4 + color_idx
-            if prom_addr < len(palette_prom):
-                color_ref = palette_prom[prom_addr] & 0x1F
-                rgb565 = base_colors[color_ref] if color_ref < len(base_colors) else 0
-            else:
-                rgb565 = 0
-            
-            # Color 0 is transparent (black)
-            if color_idx == 0:
-                rgb565 = 0
-            
-            colormap.append(rgb565)
-    
-    prefix = 'mspacman' if GAME_NAME == 'mspacman' else 'pacman'
-    
-    output = [
-        f'/* {prefix}_cmap.h - {GAME_NAME.title()} Color Palette (RGB565) */',
-        '/* AUTO-GENERATED - DO NOT EDIT */',
-        '',
-        f'#ifndef {prefix.upper()}_CMAP_H',
-        f'#define {prefix.upper()}_CMAP_H',
-        '',
-        '#include <stdint.h>',
-        '',
-        '// 64 palettes × 4 colors = 256 RGB565 values',
-        f'static const uint16_t {prefix}_colormap[64][4] = {{',
-    ]
+    colormap = array('H', [0]) * 256
+    palette = palette_prom[:256]
+    colormap[:len(palette)] = array('H', [base_colors[ref & 0x1F] for ref in palette])
     
-    for pal_idx in range(64):
-        colors = colormap[pal_idx * 4 : pal_idx * 4 + 4]
-        hex_values = ', '.join(f'0x{c:04X}' for c in colors)
-        output.append(f'  {{ {hex_values} }},  // Palette {pal_idx}')
+    # Color 0 is transparent (black)
+    colormap[::4] = array('H', [0]) * 64
     
-    output.extend([
-        '};',
-        '',
-        f'#endif // {prefix.upper()}_CMAP_H',
-    ])
+    def colormap_lines():
+        yield '// 64 palettes × 4 colors = 256 RGB565 values\n'
+        yield f'static const uint16_t {prefix}_colormap[64][4] = {{\n'
+        row_fmt = '  { ' + ', '.join(['0x%04X'] * 4) + ' },  // Palette %d\n'
+        for pal_idx in range(64):
+            colors = colormap[pal_idx * 4 : pal_idx * 4 + 4]
+            yield row_fmt % (*colors, pal_idx)
+        yield '};'
     
-    out_path = out_dir / f'{prefix}_cmap.h'
-    with open(out_path, 'w') as f:
-        f.write('\n'.join(output))
+    write_header(out_path, f'{prefix.upper()}_CMAP_H', f'{game_name.title()} Color Palette (RGB565)',
+                 colormap_lines())
     
     print(f"  Wrote {out_path}")
     return True
 
 
-def convert_wavetable(rom_dir, out_dir):
+def convert_wavetable(rom_index, out_dir, game_name, rom_files, force=False):
     """Convert sound PROMs to wavetable."""
-    global GAME_NAME
     print("Converting audio wavetable...")
     
-    path1 = rom_dir / ROM_FILES['sound_prom'][0]
-    path2 = rom_dir / ROM_FILES['sound_prom'][1]
+    path1 = rom_index.get(rom_files['sound_prom'][0])
+    path2 = rom_index.get(rom_files['sound_prom'][1])
     
-    if not path1.exists():
-        print(f"  ERROR: Missing {ROM_FILES['sound_prom'][0]}")
+    if not path1:
+        print(f"  ERROR: Missing {rom_files['sound_prom'][0]}")
         return False
-    if not path2.exists():
-        print(f"  ERROR: Missing {ROM_FILES['sound_prom'][1]}")
+    if not path2:
+        print(f"  ERROR: Missing {rom_files['sound_prom'][1]}")
         return False
     
+    prefix = game_name
+    out_path = out_dir / f'{prefix}_wavetable.h'
+    if not force and is_up_to_date(out_path, [path1, path2]):
+        print(f"  {out_path} up-to-date, skipping")
+        return True
+    
     prom1 = read_rom_file(path1)
     prom2 = read_rom_file(path2)
     
-    print(f"  {ROM_FILES['sound_prom'][0]}: {len(prom1)} bytes")
-    print(f"  {ROM_FILES['sound_prom'][1]}: {len(prom2)} bytes")
+    print(f"  {rom_files['sound_prom'][0]}: {len(prom1)} bytes")
+    print(f"  {rom_files['sound_prom'][1]}: {len(prom2)} bytes")
     
     # Combine both PROMs into wavetable
     # Each PROM has 8 waveforms × 32 samples = 256 bytes
     # Values are 0-15, convert to signed -7 to +8 (like Galagino: value - 7)
-    wavetable = []
-    
-    # First PROM: waves 0-7
-    for wave_idx in range(8):
-        for sample_idx in range(32):
-            byte_val = prom1[wave_idx * 32 + sample_idx] if (wave_idx * 32 + sample_idx) < len(prom1) else 0
-            # Galagino uses value - 7 (not value - 8)
-            signed_val = (byte_val & 0x0F) - 7
-            wavetable.append(signed_val)
-    
-    # Second PROM: waves 8-15
-    for wave_idx in range(8):
-        for sample_idx in range(32):
-            byte_val = prom2[wave_idx * 32 + sample_idx] if (wave_idx * 32 + sample_idx) < len(prom2) else 0
-            signed_val = (byte_val & 0x0F) - 7
-            wavetable.append(signed_val)
-    
-    prefix = 'mspacman' if GAME_NAME == 'mspacman' else 'pacman'
-    
-    output = [
-        f'/* {prefix}_wavetable.h - {GAME_NAME.title()} Audio Wavetable */',
-        '/* AUTO-GENERATED - DO NOT EDIT */',
-        '',
-        f'#ifndef {prefix.upper()}_WAVETABLE_H',
-        f'#define {prefix.upper()}_WAVETABLE_H',
-        '',
-        '#include <stdint.h>',
-        '',
-        '// 16 waveforms × 32 samples = 512 signed bytes',
-        f'static const int8_t {prefix}_wavetable[16][32] = {{',
-    ]
-    
-    for wave_idx in range(16):
-        samples = wavetable[wave_idx * 32 : wave_idx * 32 + 32]
-        hex_values = ', '.join(f'{s:3d}' for s in samples)
-        output.append(f'  {{ {hex_values} }},  // Wave {wave_idx}')
-    
-    output.extend([
-        '};',
-        '',
-        f'#endif // {prefix.upper()}_WAVETABLE_H',
-    ])
-    
-    out_path = out_dir / f'{prefix}_wavetable.h'
-    with open(out_path, 'w') as f:
-        f.write('\n'.join(output))
+    # Missing samples read as 0; translate maps every byte to its signed
+    # sample in one C call and array('b') reinterprets it as int8
+    wavetable = array('b', b''.join(
+        prom[:256].ljust(256, b'\x00').translate(WAVE_SAMPLE_TABLE)
+        for prom in (prom1, prom2)  # waves 0-7, then waves 8-15
+    ))
+    
+    def wavetable_lines():
+        yield '// 16 waveforms × 32 samples = 512 signed bytes\n'
+        yield f'static const int8_t {prefix}_wavetable[16][32] = {{\n'
+        row_fmt = '  { ' + ', '.join(['%3d'] * 32) + ' },  // Wave %d\n'
+        for wave_idx in range(16):
+            samples = wavetable[wave_idx * 32 : wave_idx * 32 + 32]
+            yield row_fmt % (*samples, wave_idx)
+        yield '};'
+    
+    write_header(out_path, f'{prefix.upper()}_WAVETABLE_H', f'{game_name.title()} Audio Wavetable',
+                 wavetable_lines())
     
     print(f"  Wrote {out_path}")
     return True
 
 
-def detect_game(rom_dir):
+def detect_game(rom_index):
     """Auto-detect which game based on ROM files present."""
     # Check for Ms. Pac-Man boot ROMs
-    if (rom_dir / 'boot1').exists():
+    if 'boot1' in rom_index:
         return 'mspacman'
     # Check for alternate Ms. Pac-Man ROMs (u5, u6, u7 patches)
-    if (rom_dir / 'u5').exists() and (rom_dir / 'u6').exists():
+    if 'u5' in rom_index and 'u6' in rom_index:
         return 'mspacman'
     # Default to Pac-Man
     return 'pacman'
 
 
 def main():
-    global ROM_FILES, GAME_NAME
-    
     # Parse command line arguments
     parser = argparse.ArgumentParser(
         description='Convert Pac-Man / Ms. Pac-Man ROMs for PELLETINO'
@@ -727,6 +739,8 @@ def main():
     parser.add_argument('output_dir', nargs='?', help='Output directory')
     parser.add_argument('--game', choices=['pacman', 'mspacman'],
                         help='Game to convert (auto-detects if not specified)')
+    parser.add_argument('--force', action='store_true',
+                        help='Convert even if the headers are newer than the ROMs')
     args = parser.parse_args()
     
     # Determine directories
@@ -745,21 +759,23 @@ def main():
     print(f"ROM directory: {rom_dir}")
     print(f"Output directory: {out_dir}")
     
-    if not rom_dir.exists():
+    # The directory scan doubles as the existence check
+    try:
+        rom_index = scan_rom_dir(rom_dir)
+    except (FileNotFoundError, NotADirectoryError):
         print(f"ERROR: ROM directory not found: {rom_dir}")
         return 1
     
     # Detect or set game type
     if args.game:
-        GAME_NAME = args.game
+        game_name = args.game
     else:
-        GAME_NAME = detect_game(rom_dir)
+        game_name = detect_game(rom_index)
+    rom_files = GAME_ROM_FILES[game_name]
     
-    if GAME_NAME == 'mspacman':
-        ROM_FILES = MSPACMAN_ROM_FILES
+    if game_name == 'mspacman':
         print(f"Game: Ms. Pac-Man")
     else:
-        ROM_FILES = PACMAN_ROM_FILES
         print(f"Game: Pac-Man")
     print()
     
@@ -768,15 +784,13 @@ def main():
     
     # Convert all ROM types
     success = True
-    success &= convert_program_rom(rom_dir, out_dir)
-    success &= convert_tiles(rom_dir, out_dir)
-    success &= convert_sprites(rom_dir, out_dir)
-    success &= convert_colormap(rom_dir, out_dir)
-    success &= convert_wavetable(rom_dir, out_dir)
+    for convert in (convert_program_rom, convert_tiles, convert_sprites,
+                    convert_colormap, convert_wavetable):
+        success &= convert(rom_index, out_dir, game_name, rom_files, args.force)
     
     if success:
         print()
-        print(f"{GAME_NAME.title()} ROM conversion complete!")
+        print(f"{game_name.title()} ROM conversion complete!")
         return 0
     else:
         print()